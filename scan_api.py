@@ -4,15 +4,44 @@ eSCL Scanner API for Home Assistant
 Scans documents from HP printers using eSCL protocol and uploads to Paperless-ngx
 """
 
-from flask import Flask, request, jsonify
-import requests
+from quart import Quart, request, jsonify
+from quart.json.provider import DefaultJSONProvider
+import orjson
+from hypercorn.config import Config
+from hypercorn.asyncio import serve
+import aiohttp
+import asyncio
+from yarl import URL
+from urllib.parse import urljoin
+from lxml import etree
+from pypdf import PdfWriter
+import io
+import gzip
+import zlib
 import time
+import math
 import os
+import string
+import contextlib
+import shutil
+import tempfile
+from dataclasses import dataclass
 from dotenv import load_dotenv
-from datetime import datetime
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes with orjson, including dataclasses"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 load_dotenv()
-app = Flask(__name__)
+app = Quart(__name__)
+app.json = ORJSONProvider(app)
 
 # Configuration from environment variables
 SCANNER_IP = os.getenv("SCANNER_IP", "printer.local")
@@ -20,9 +49,189 @@ PAPERLESS_URL = os.getenv("PAPERLESS_URL", "http://localhost:8000")
 PAPERLESS_TOKEN = os.getenv("PAPERLESS_TOKEN", "")
 API_PORT = int(os.getenv("API_PORT", "5050"))
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "spool")
+
+# Auto-scan mode state, set while auto-scan is enabled
+AUTO_SCAN_EVENT = asyncio.Event()
+AUTOSCAN_INTERVAL = 2
 
-# Auto-scan mode state
-AUTO_SCAN_ENABLED = False
+# eSCL XML queries
+ESCL_NAMESPACES = {"scan": "http://schemas.hp.com/imaging/escl/2011/05/03"}
+ADF_XPATH = etree.XPath("//scan:Adf", namespaces=ESCL_NAMESPACES)
+ADF_STATE_XPATH = etree.XPath("//scan:AdfState/text()", namespaces=ESCL_NAMESPACES)
+
+# Cached ADF capability per scanner: {scanner_ip: (timestamp, has_adf)}
+CAPABILITIES_TTL = 3600
+capabilities_cache = {}
+
+# eSCL ScanSettings request body, rendered by render_scan_settings()
+SCAN_SETTINGS_TEMPLATE = string.Template(
+    """<?xml version="1.0" encoding="UTF-8"?>
+<scan:ScanSettings xmlns:scan="http://schemas.hp.com/imaging/escl/2011/05/03" xmlns:pwg="http://www.pwg.org/schemas/2010/12/sm">
+    <pwg:Version>2.9</pwg:Version>
+    <scan:Intent>$intent</scan:Intent>
+    <pwg:InputSource>$input_source</pwg:InputSource>
+    <scan:DocumentFormatExt>$format</scan:DocumentFormatExt>
+    <scan:XResolution>$resolution</scan:XResolution>
+    <scan:YResolution>$resolution</scan:YResolution>
+    <scan:Brightness>$brightness</scan:Brightness>
+    <scan:Contrast>$contrast</scan:Contrast>
+    <scan:Duplex>$duplex</scan:Duplex>
+    <scan:ColorMode>$color_mode</scan:ColorMode>
+    <scan:JobSourceInfo>
+        <scan:UserName>$user_name</scan:UserName>
+        <scan:MachineName>$machine_name</scan:MachineName>
+        <scan:Application>$application_name</scan:Application>
+    </scan:JobSourceInfo>
+    <scan:CompressionFactor>$compression_factor</scan:CompressionFactor>
+    <pwg:ScanRegions>
+        <pwg:ScanRegion>
+            <pwg:Height>$height</pwg:Height>
+            <pwg:ContentRegionUnits>escl:ThreeHundredthsOfInches</pwg:ContentRegionUnits>
+            <pwg:Width>$width</pwg:Width>
+            <pwg:XOffset>0</pwg:XOffset>
+            <pwg:YOffset>0</pwg:YOffset>
+        </pwg:ScanRegion>
+    </pwg:ScanRegions>
+</scan:ScanSettings>"""
+)
+
+SCAN_SETTINGS_DEFAULTS = {
+    "intent": "Document",
+    "input_source": "Feeder",
+    "format": "application/pdf",
+    "resolution": 300,
+    "brightness": 4,
+    "contrast": 4,
+    "duplex": False,
+    "color_mode": "RGB24",
+    "user_name": "admin",
+    "machine_name": "printer",
+    "application_name": "EWS-WebScan",
+    "compression_factor": 25,
+    "height": 3507,
+    "width": 2481,
+}
+
+
+# Rendered ScanSettings bytes keyed on the tuple of setting values
+SCAN_SETTINGS_CACHE_SIZE = 16
+scan_settings_cache = {}
+
+
+def render_scan_settings(settings):
+    """Render ScanSettings XML bytes, reusing the result for repeated settings"""
+    key = tuple(settings.get(name, default) for name, default in SCAN_SETTINGS_DEFAULTS.items())
+    xml = scan_settings_cache.get(key)
+    if xml is None:
+        fields = dict(zip(SCAN_SETTINGS_DEFAULTS, key))
+        fields["duplex"] = str(fields["duplex"]).lower()
+        xml = SCAN_SETTINGS_TEMPLATE.substitute(fields).encode("utf-8")
+
+        # Evict the oldest entry rather than grow unbounded
+        if len(scan_settings_cache) >= SCAN_SETTINGS_CACHE_SIZE:
+            del scan_settings_cache[next(iter(scan_settings_cache))]
+        scan_settings_cache[key] = xml
+    return xml
+
+
+# Background auto-scan task, started when the server starts serving
+autoscan_task = None
+
+# Spooled scan jobs waiting to be merged and uploaded, the task doing it,
+# and jobs whose upload gave up (kept on disk until retried)
+upload_queue = asyncio.Queue()
+upload_task = None
+failed_uploads = set()
+
+# Uploads back off from 2 s up to 60 s between attempts for 15 minutes
+UPLOAD_RETRY_WINDOW = 15 * 60
+UPLOAD_MAX_DELAY = 60
+
+# Docker sends SIGKILL 10 s after SIGTERM, so Hypercorn's wait for open
+# requests plus the wait for queued uploads must stay well below that
+SHUTDOWN_GRACE_TIMEOUT = 2
+UPLOAD_DRAIN_TIMEOUT = 5
+
+# Smallest upload worth gzip-compressing when PAPERLESS_GZIP_UPLOADS is set
+GZIP_MIN_SIZE = 1024 * 1024
+
+# Serializes scans; the scanner rejects a second concurrent job
+scan_semaphore = asyncio.Semaphore(1)
+
+
+def retry_after(headers, default, minimum, maximum):
+    """Get the delay in seconds from a Retry-After header, or the default
+
+    The result is at least minimum, so a scanner sending Retry-After: 0
+    can't make us poll in a tight loop, and at most maximum.
+    """
+    value = headers.get("Retry-After") if headers else None
+    try:
+        delay = float(value)
+    except (TypeError, ValueError):
+        delay = default
+    if not math.isfinite(delay):
+        delay = default
+    return min(max(delay, minimum), maximum)
+
+
+def conditional_headers(headers):
+    """Build conditional request headers from a response's validators"""
+    conditional = {}
+    if "Last-Modified" in headers:
+        conditional["If-Modified-Since"] = headers["Last-Modified"]
+    if "ETag" in headers:
+        conditional["If-None-Match"] = headers["ETag"]
+    return conditional
+
+
+def merge_pdfs(documents):
+    """Concatenate PDF documents into a single PDF"""
+    writer = PdfWriter()
+    for document in documents:
+        writer.append(io.BytesIO(document))
+
+    merged = io.BytesIO()
+    writer.write(merged)
+    return merged.getvalue()
+
+
+def spool_document(pages, filename, title):
+    """Write scanned pages to the upload spool, returning the job directory"""
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    job = tempfile.mkdtemp(prefix=f"{os.path.splitext(filename)[0]}_", dir=UPLOAD_SPOOL_DIR)
+    for number, page in enumerate(pages, 1):
+        with open(os.path.join(job, f"{number:03d}.pdf"), "wb") as f:
+            f.write(page)
+
+    # Written last, so a job without meta.json is incomplete
+    meta_path = os.path.join(job, "meta.json")
+    with open(f"{meta_path}.tmp", "wb") as f:
+        f.write(orjson.dumps({"filename": filename, "title": title}))
+    os.replace(f"{meta_path}.tmp", meta_path)
+    return job
+
+
+def load_spooled_document(job):
+    """Read a spooled job, returning its pages, filename and title"""
+    with open(os.path.join(job, "meta.json"), "rb") as f:
+        meta = orjson.loads(f.read())
+
+    pages = []
+    for name in sorted(os.listdir(job)):
+        if name.endswith(".pdf"):
+            with open(os.path.join(job, name), "rb") as f:
+                pages.append(f.read())
+    return pages, meta["filename"], meta["title"]
+
+
+def spooled_jobs():
+    """List complete spooled jobs, oldest first"""
+    if not os.path.isdir(UPLOAD_SPOOL_DIR):
+        return []
+    jobs = (os.path.join(UPLOAD_SPOOL_DIR, name) for name in os.listdir(UPLOAD_SPOOL_DIR))
+    return sorted(job for job in jobs if os.path.isfile(os.path.join(job, "meta.json")))
 
 
 class ESCLScanner:
@@ -33,125 +242,172 @@ class ESCLScanner:
         protocol = os.getenv("SCANNER_PROTOCOL", "https")
         self.verify_tls = os.getenv("SCANNER_VERIFY_TLS", "false").lower() in ("1", "true", "yes")
         self.base_url = f"{protocol}://{scanner_ip}/eSCL"
+        self.session = None
+        self.status = None
+        self.status_headers = {}
+
+    async def open(self):
+        """Open a pooled HTTP session to the scanner"""
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=8, limit_per_host=4, ttl_dns_cache=300
+            )
+        )
+
+    async def close(self):
+        """Close the HTTP session"""
+        if self.session:
+            await self.session.close()
 
-    def get_scanner_status(self):
-        """Get scanner status"""
+    async def get_scanner_status(self):
+        """Get scanner status, revalidating the previous response when possible
+
+        The read timeout is generous so scanners that hold a conditional
+        request open until the status changes can long-poll.
+        """
         try:
-            response = requests.get(f"{self.base_url}/ScannerStatus", timeout=10, verify=self.verify_tls)
-            response.raise_for_status()
-            return response.text
-        except:
+            async with self.session.get(
+                f"{self.base_url}/ScannerStatus",
+                headers=self.status_headers,
+                timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=60),
+                ssl=self.verify_tls,
+            ) as response:
+                if response.status == 304:
+                    return self.status
+
+                response.raise_for_status()
+                self.status = await response.read()
+                self.status_headers = conditional_headers(response.headers)
+                return self.status
+        except Exception:
             return None
 
-    def get_scanner_capabilities(self):
-        """Get scanner capabilities and check for ADF"""
+    async def get_scanner_capabilities(self):
+        """Get scanner capabilities and check for ADF, or None if unreachable"""
         try:
-            response = requests.get(f"{self.base_url}/ScannerCapabilities", timeout=10, verify=self.verify_tls)
-            response.raise_for_status()
-
-            # Check if ADF is mentioned in capabilities
-            capabilities_text = response.text
-            has_adf = "Adf" in capabilities_text or "ADF" in capabilities_text
+            async with self.session.get(
+                f"{self.base_url}/ScannerCapabilities",
+                timeout=aiohttp.ClientTimeout(total=10),
+                ssl=self.verify_tls,
+            ) as response:
+                response.raise_for_status()
 
-            return has_adf
-        except:
-            return False
+                # Check for an Adf source in capabilities, skipping the
+                # parse when the raw bytes can't contain one
+                capabilities = await response.read()
+                if b"Adf" not in capabilities:
+                    return False
+                return bool(ADF_XPATH(etree.fromstring(capabilities)))
+        except Exception:
+            return None
 
-    def check_adf_loaded(self):
+    async def check_adf_loaded(self):
         """Check if document is loaded in ADF"""
         try:
-            status = self.get_scanner_status()
-            if status:
-                # Check for ADF loaded indicators
-                return "AdfLoaded" in status or "MediaLoaded" in status
+            status = await self.get_scanner_status()
+            # Check the reported ADF state, skipping the parse when the raw
+            # bytes can't contain a loaded state
+            if status and b"ScannerAdfLoaded" in status:
+                return "ScannerAdfLoaded" in ADF_STATE_XPATH(etree.fromstring(status))
             return False
-        except:
+        except Exception:
             return False
 
-    def create_scan_job(self, settings):
-        """Create a scan job with specified settings"""
-        scan_settings_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<scan:ScanSettings xmlns:scan="http://schemas.hp.com/imaging/escl/2011/05/03" xmlns:pwg="http://www.pwg.org/schemas/2010/12/sm">
-    <pwg:Version>2.9</pwg:Version>
-    <scan:Intent>{settings.get('intent', 'Document')}</scan:Intent>
-    <pwg:InputSource>{settings.get('input_source', 'Feeder')}</pwg:InputSource>
-    <scan:DocumentFormatExt>{settings.get('format', 'application/pdf')}</scan:DocumentFormatExt>
-    <scan:XResolution>{settings.get('resolution', 300)}</scan:XResolution>
-    <scan:YResolution>{settings.get('resolution', 300)}</scan:YResolution>
-    <scan:Brightness>{settings.get('brightness', 4)}</scan:Brightness>
-    <scan:Contrast>{settings.get('contrast', 4)}</scan:Contrast>
-    <scan:Duplex>{str(settings.get('duplex', False)).lower()}</scan:Duplex>
-    <scan:ColorMode>{settings.get('color_mode', 'RGB24')}</scan:ColorMode>
-    <scan:JobSourceInfo>
-        <scan:UserName>{settings.get('user_name', 'admin')}</scan:UserName>
-        <scan:MachineName>{settings.get('machine_name', 'printer')}</scan:MachineName>
-        <scan:Application>{settings.get('application_name', 'EWS-WebScan')}</scan:Application>
-    </scan:JobSourceInfo>
-    <scan:CompressionFactor>{settings.get('compression_factor', 25)}</scan:CompressionFactor>
-    <pwg:ScanRegions>
-        <pwg:ScanRegion>
-            <pwg:Height>{settings.get('height', 3507)}</pwg:Height>
-            <pwg:ContentRegionUnits>escl:ThreeHundredthsOfInches</pwg:ContentRegionUnits>
-            <pwg:Width>{settings.get('width', 2481)}</pwg:Width>
-            <pwg:XOffset>0</pwg:XOffset>
-            <pwg:YOffset>0</pwg:YOffset>
-        </pwg:ScanRegion>
-    </pwg:ScanRegions>
-</scan:ScanSettings>"""
+    async def create_scan_job(self, settings):
+        """Create a scan job with specified settings, returning the job URL"""
+        scan_settings_xml = render_scan_settings(settings)
 
         try:
             headers = {"Content-Type": "text/xml"}
-            response = requests.post(
+            async with self.session.post(
                 f"{self.base_url}/ScanJobs",
                 data=scan_settings_xml,
                 headers=headers,
-                timeout=10,
-                verify=self.verify_tls,
-            )
-            response.raise_for_status()
+                timeout=aiohttp.ClientTimeout(total=10),
+                ssl=self.verify_tls,
+            ) as response:
+                response.raise_for_status()
 
-            job_location = response.headers.get("Location")
-            if job_location:
-                return job_location
-            else:
-                raise ValueError("No job location returned")
+                job_location = response.headers.get("Location")
+                if job_location:
+                    # Scanners often report their own hostname, scheme or port,
+                    # so keep only the path and query and send follow-ups to
+                    # the endpoint we were configured with
+                    resolved = URL(urljoin(self.base_url + "/", job_location))
+                    return URL(self.base_url).join(
+                        URL(resolved.raw_path_qs, encoded=True)
+                    )
+                else:
+                    raise ValueError("No job location returned")
 
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             raise Exception(f"Error creating scan job: {e}")
 
-    def get_scan_document(self, job_location, max_retries=30, retry_delay=2):
-        """Retrieve the scanned document with retry logic"""
-        doc_url = f"{job_location}/NextDocument"
+    async def get_scan_document(
+        self, job_location, timeout=120, initial_delay=0.25, max_delay=5.0
+    ):
+        """Retrieve the scanned document, backing off while the scanner is busy
+
+        Returns the open response, which the caller must release, or None
+        once the job has no more documents.
+        """
+        doc_url = job_location / "NextDocument"
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
 
-        for attempt in range(max_retries):
+        while True:
             try:
-                response = requests.get(doc_url, timeout=60, verify=self.verify_tls)
-                response.raise_for_status()
-                return response.content
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 503:
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        raise Exception(
-                            f"Scan timed out after {max_retries * retry_delay} seconds"
-                        )
-                else:
-                    raise Exception(f"Error retrieving scanned document: {e}")
-            except requests.exceptions.RequestException as e:
+                response = await self.session.get(
+                    doc_url,
+                    timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=60),
+                    ssl=self.verify_tls,
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 raise Exception(f"Error retrieving scanned document: {e}")
 
-        raise Exception("Failed to retrieve scan")
+            if response.status in (404, 410):
+                response.release()
+                return None
+
+            if response.status != 503:
+                try:
+                    response.raise_for_status()
+                except aiohttp.ClientResponseError as e:
+                    response.release()
+                    raise Exception(f"Error retrieving scanned document: {e}")
+                return response
 
-    def delete_scan_job(self, job_location):
+            # Scanner still busy: honour Retry-After, else back off exponentially
+            response.release()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Exception(f"Scan timed out after {timeout} seconds")
+            await asyncio.sleep(retry_after(response.headers, delay, initial_delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+    async def delete_scan_job(self, job_location):
         """Delete the scan job"""
         try:
-            requests.delete(job_location, timeout=10)
-        except:
+            async with self.session.delete(
+                job_location,
+                timeout=aiohttp.ClientTimeout(total=10),
+                ssl=self.verify_tls,
+            ):
+                pass
+        except Exception:
             pass
 
 
+def is_compressible(file_data):
+    """Check if a document is large enough and compresses well enough to gzip"""
+    if len(file_data) < GZIP_MIN_SIZE:
+        return False
+
+    # Already-compressed image streams barely shrink, so test a sample first
+    sample = file_data[:65536]
+    return len(zlib.compress(sample, 1)) < 0.9 * len(sample)
+
+
 class PaperlessUploader:
     """Handle uploads to Paperless-ngx"""
 
@@ -159,36 +415,98 @@ class PaperlessUploader:
         self.paperless_url = paperless_url.rstrip("/")
         self.api_token = api_token
         self.headers = {"Authorization": f"Token {api_token}"}
+        self.gzip_uploads = os.getenv("PAPERLESS_GZIP_UPLOADS", "false").lower() in ("1", "true", "yes")
+        self.session = None
+
+    async def open(self):
+        """Open a pooled HTTP session to Paperless-ngx with auth applied"""
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(
+                limit=8, limit_per_host=4, ttl_dns_cache=300
+            ),
+        )
 
-    def upload_document(self, file_data, filename, title=None):
+    async def close(self):
+        """Close the HTTP session"""
+        if self.session:
+            await self.session.close()
+
+    async def upload_document(self, file_data, filename, title=None):
         """Upload document to Paperless-ngx"""
         try:
             upload_url = f"{self.paperless_url}/api/documents/post_document/"
 
-            files = {"document": (filename, file_data, "application/pdf")}
-            data = {}
+            data = aiohttp.FormData()
+            data.add_field(
+                "document", file_data, filename=filename, content_type="application/pdf"
+            )
 
             if title:
-                data["title"] = title
-
-            response = requests.post(
-                upload_url, files=files, data=data, headers=self.headers, timeout=60
-            )
-            response.raise_for_status()
-            return True
+                data.add_field("title", title)
+
+            headers = {}
+            if self.gzip_uploads and is_compressible(file_data):
+                form = data()
+                headers = {"Content-Type": form.content_type, "Content-Encoding": "gzip"}
+                data = await asyncio.to_thread(
+                    gzip.compress, await form.as_bytes(), compresslevel=1
+                )
+
+            async with self.session.post(
+                upload_url,
+                data=data,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=60),
+            ) as response:
+                response.raise_for_status()
+                return True
 
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             raise Exception(f"Error uploading to Paperless-ngx: {e}")
 
 
-def perform_scan(resolution=300, color_mode="RGB24", source=None, title=None):
-    """Perform a scan operation"""
-    # Initialize scanner
-    scanner = ESCLScanner(SCANNER_IP)
+async def get_cached_adf(scanner):
+    """Check for ADF, probing the scanner at most once per CAPABILITIES_TTL"""
+    cached = capabilities_cache.get(scanner.scanner_ip)
+    if cached and time.monotonic() - cached[0] < CAPABILITIES_TTL:
+        return cached[1]
+
+    has_adf = await scanner.get_scanner_capabilities()
+    if has_adf is None:
+        # Don't cache a failed probe
+        return False
+
+    capabilities_cache[scanner.scanner_ip] = (time.monotonic(), has_adf)
+    return has_adf
+
+
+@dataclass(slots=True)
+class ScanResult:
+    """Outcome of a scan, serialized as the /scan response"""
+
+    success: bool
+    status: str
+    message: str
+    filename: str
+    source: str
+
 
+scanner = ESCLScanner(SCANNER_IP)
+uploader = PaperlessUploader(PAPERLESS_URL, PAPERLESS_TOKEN)
+
+
+async def perform_scan(resolution=300, color_mode="RGB24", source=None, title=None):
+    """Perform a scan operation, waiting for any scan already in progress"""
+    async with scan_semaphore:
+        return await run_scan(resolution, color_mode, source, title)
+
+
+async def run_scan(resolution, color_mode, source, title):
+    """Run a scan job and queue the document for upload"""
     # Auto-detect ADF if source not specified
     if source is None:
-        has_adf = scanner.get_scanner_capabilities()
+        has_adf = await get_cached_adf(scanner)
         source = "Feeder" if has_adf else "Platen"
         app.logger.info(f"Auto-detected source: {source}")
 
@@ -211,32 +529,96 @@ def perform_scan(resolution=300, color_mode="RGB24", source=None, title=None):
     }
 
     # Create scan job
-    job_location = scanner.create_scan_job(scan_settings)
-
-    # Get scanned document
-    document_data = scanner.get_scan_document(job_location)
-
-    # Clean up scan job
-    scanner.delete_scan_job(job_location)
+    job_location = await scanner.create_scan_job(scan_settings)
 
     # Generate filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
     filename = f"scan_{timestamp}.pdf"
 
-    # Upload to Paperless-ngx
-    uploader = PaperlessUploader(PAPERLESS_URL, PAPERLESS_TOKEN)
-    uploader.upload_document(document_data, filename, title=title)
+    # Read each document while the scanner prepares the next one
+    documents = asyncio.Queue(maxsize=1)
 
-    return {
-        "success": True,
-        "message": f"Scanned {len(document_data)} bytes and uploaded to Paperless",
-        "filename": filename,
-        "source": source,
-    }
+    async def fetch_documents():
+        """Queue each document of the job, then None once the scanner has no more
+
+        A failure is queued in place of a document, so the reader can decide
+        whether it fails the scan or just ends the job.
+        """
+        while True:
+            try:
+                item = await scanner.get_scan_document(job_location)
+            except Exception as e:
+                item = e
+            try:
+                await documents.put(item)
+            except asyncio.CancelledError:
+                # Cancelled while waiting on the reader; the queue cleanup
+                # won't see this response
+                if isinstance(item, aiohttp.ClientResponse):
+                    item.release()
+                raise
+            if not isinstance(item, aiohttp.ClientResponse):
+                return
+
+    async def read_documents():
+        """Read the body of each queued document
+
+        Once a document has been read, a later failure ends the job instead
+        of discarding the pages already scanned.
+        """
+        pages = []
+        while (item := await documents.get()) is not None:
+            if isinstance(item, Exception):
+                if not pages:
+                    raise item
+                app.logger.warning(f"Ending scan job after {len(pages)} document(s): {item}")
+                break
+
+            try:
+                pages.append(await item.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not pages:
+                    raise Exception(f"Error retrieving scanned document: {e}")
+                app.logger.warning(f"Ending scan job after {len(pages)} document(s): {e}")
+                break
+            finally:
+                item.release()
+
+        if not pages:
+            raise Exception("Scanner returned no document")
+        return pages
+
+    producer = asyncio.create_task(fetch_documents())
+    try:
+        pages = await read_documents()
+    finally:
+        producer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await producer
+        while not documents.empty():
+            item = documents.get_nowait()
+            if isinstance(item, aiohttp.ClientResponse):
+                item.release()
+
+        # Clean up scan job
+        await scanner.delete_scan_job(job_location)
+
+    # Spool the pages so the upload survives failures and restarts, then
+    # queue the merge and upload to Paperless-ngx
+    job = await asyncio.to_thread(spool_document, pages, filename, title)
+    upload_queue.put_nowait(job)
+
+    return ScanResult(
+        success=True,
+        status="queued",
+        message=f"Scanned {sum(map(len, pages))} bytes and queued upload to Paperless",
+        filename=filename,
+        source=source,
+    )
 
 
 @app.route("/scan", methods=["GET", "POST"])
-def scan():
+async def scan():
     """Trigger a scan with optional parameters"""
     if request.method == "GET":
         # GET request with default settings
@@ -246,30 +628,29 @@ def scan():
         title = request.args.get("title")
     else:
         # POST request with JSON body
-        data = request.get_json() or {}
+        data = await request.get_json() or {}
         resolution = data.get("resolution", 300)
         color_mode = data.get("color_mode", "RGB24")
         source = data.get("source")
         title = data.get("title")
 
     try:
-        result = perform_scan(resolution, color_mode, source, title)
-        return jsonify(result), 200
+        result = await perform_scan(resolution, color_mode, source, title)
+        return jsonify(result), 202
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/autoscan/enable", methods=["POST", "GET"])
-def enable_autoscan():
+async def enable_autoscan():
     """Enable auto-scan mode"""
-    global AUTO_SCAN_ENABLED
-    AUTO_SCAN_ENABLED = True
+    AUTO_SCAN_EVENT.set()
     return (
         jsonify(
             {
                 "success": True,
                 "message": "Auto-scan enabled",
-                "autoscan": AUTO_SCAN_ENABLED,
+                "autoscan": AUTO_SCAN_EVENT.is_set(),
             }
         ),
         200,
@@ -277,16 +658,15 @@ def enable_autoscan():
 
 
 @app.route("/autoscan/disable", methods=["POST", "GET"])
-def disable_autoscan():
+async def disable_autoscan():
     """Disable auto-scan mode"""
-    global AUTO_SCAN_ENABLED
-    AUTO_SCAN_ENABLED = False
+    AUTO_SCAN_EVENT.clear()
     return (
         jsonify(
             {
                 "success": True,
                 "message": "Auto-scan disabled",
-                "autoscan": AUTO_SCAN_ENABLED,
+                "autoscan": AUTO_SCAN_EVENT.is_set(),
             }
         ),
         200,
@@ -294,49 +674,166 @@ def disable_autoscan():
 
 
 @app.route("/autoscan/status", methods=["GET"])
-def autoscan_status():
+async def autoscan_status():
     """Get auto-scan mode status"""
-    return jsonify({"enabled": AUTO_SCAN_ENABLED}), 200
+    return jsonify({"enabled": AUTO_SCAN_EVENT.is_set()}), 200
 
 
-def autoscan_worker():
-    """Background worker that checks for documents in ADF and scans automatically"""
-    import threading
+async def autoscan():
+    """Scan the document detected in the ADF"""
+    was_busy = scan_semaphore.locked()
+    async with scan_semaphore:
+        # A scan that ran while we waited may have emptied the feeder
+        if was_busy and not await scanner.check_adf_loaded():
+            return
 
-    def check_and_scan():
-        global AUTO_SCAN_ENABLED
-        scanner = ESCLScanner(SCANNER_IP)
-        last_scan_time = 0
+        app.logger.info("Document detected in ADF, auto-scanning...")
+        result = await run_scan(
+            resolution=300, color_mode="RGB24", source="Feeder", title=None
+        )
+        app.logger.info(f"Auto-scan completed: {result.filename}")
 
-        while True:
-            time.sleep(2)  # Check every 2 seconds
 
-            if AUTO_SCAN_ENABLED:
-                try:
-                    # Check if document is loaded in ADF
-                    if scanner.check_adf_loaded():
-                        current_time = time.time()
-                        # Debounce: wait 3 seconds before scanning
-                        if current_time - last_scan_time > 3:
-                            app.logger.info(
-                                "Document detected in ADF, auto-scanning..."
-                            )
-                            result = perform_scan(
-                                resolution=300, color_mode="RGB24", source="Feeder"
-                            )
-                            app.logger.info(
-                                f"Auto-scan completed: {result['filename']}"
-                            )
-                            last_scan_time = current_time
-                except Exception as e:
-                    app.logger.error(f"Auto-scan error: {e}")
-
-    thread = threading.Thread(target=check_and_scan, daemon=True)
-    thread.start()
+async def autoscan_loop():
+    """Background task that checks for documents in ADF and scans automatically"""
+    last_scan_time = 0
+
+    while True:
+        # Sleep until auto-scan is enabled
+        await AUTO_SCAN_EVENT.wait()
+        started = time.monotonic()
+
+        # Leave the scanner alone while another scan is running
+        if not scan_semaphore.locked():
+            try:
+                # Check if document is loaded in ADF
+                if await scanner.check_adf_loaded():
+                    current_time = time.time()
+                    # Debounce: wait 3 seconds before scanning
+                    if current_time - last_scan_time > 3:
+                        await autoscan()
+                        last_scan_time = current_time
+            except Exception as e:
+                app.logger.error(f"Auto-scan error: {e}")
+
+        # A long-polling scanner paces the loop itself; otherwise poll
+        # at most once every AUTOSCAN_INTERVAL seconds
+        await asyncio.sleep(max(AUTOSCAN_INTERVAL - (time.monotonic() - started), 0))
+
+
+async def upload_spooled_document(job):
+    """Merge and upload a spooled job, keeping it on disk if the upload gives up"""
+    pages, filename, title = await asyncio.to_thread(load_spooled_document, job)
+
+    # Combine ADF documents so Paperless-ngx receives a single upload
+    if len(pages) == 1:
+        document_data = pages[0]
+    else:
+        try:
+            document_data = await asyncio.to_thread(merge_pdfs, pages)
+        except Exception as e:
+            app.logger.error(f"Could not merge {filename}, kept at {job}: {e}")
+            failed_uploads.add(job)
+            return
+
+    deadline = time.monotonic() + UPLOAD_RETRY_WINDOW
+    delay = 2
+    while True:
+        try:
+            await uploader.upload_document(document_data, filename, title=title)
+            break
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                app.logger.error(f"Giving up on upload of {filename}, kept at {job}: {e}")
+                failed_uploads.add(job)
+                return
+            app.logger.warning(f"Upload of {filename} failed, retrying in {delay} s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, UPLOAD_MAX_DELAY)
+
+    app.logger.info(f"Uploaded {filename} to Paperless")
+    failed_uploads.discard(job)
+    await asyncio.to_thread(shutil.rmtree, job, ignore_errors=True)
+
+
+async def upload_worker():
+    """Background task that uploads spooled jobs to Paperless-ngx"""
+    while True:
+        job = await upload_queue.get()
+        try:
+            await upload_spooled_document(job)
+        except Exception as e:
+            app.logger.error(f"Upload of {job} failed: {e}")
+            failed_uploads.add(job)
+        finally:
+            upload_queue.task_done()
+
+
+@app.before_serving
+async def startup():
+    """Open the HTTP sessions and start background tasks"""
+    global autoscan_task, upload_task
+    await scanner.open()
+    await uploader.open()
+
+    # Start upload background task, resuming jobs left from the last run
+    for job in await asyncio.to_thread(spooled_jobs):
+        upload_queue.put_nowait(job)
+    upload_task = asyncio.create_task(upload_worker())
+
+    # Start auto-scan background task
+    autoscan_task = asyncio.create_task(autoscan_loop())
+
+
+@app.after_serving
+async def shutdown():
+    """Stop background tasks and close the HTTP sessions"""
+    if autoscan_task:
+        autoscan_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await autoscan_task
+    if upload_task:
+        # Give queued uploads a chance to finish
+        try:
+            await asyncio.wait_for(upload_queue.join(), timeout=UPLOAD_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            app.logger.warning("Uploads still queued, they resume on next start")
+        upload_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await upload_task
+    await scanner.close()
+    await uploader.close()
+
+
+@app.route("/uploads", methods=["GET"])
+async def uploads_status():
+    """Get queued and failed Paperless-ngx uploads"""
+    return (
+        jsonify(
+            {
+                "queued": upload_queue.qsize(),
+                "failed": sorted(os.path.basename(job) for job in failed_uploads),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/uploads/retry", methods=["POST", "GET"])
+async def retry_uploads():
+    """Re-queue uploads that gave up"""
+    jobs = sorted(failed_uploads)
+    failed_uploads.clear()
+    for job in jobs:
+        upload_queue.put_nowait(job)
+    return (
+        jsonify({"success": True, "message": f"Re-queued {len(jobs)} uploads"}),
+        200,
+    )
 
 
 @app.route("/health", methods=["GET"])
-def health():
+async def health():
     """Health check endpoint"""
     return jsonify({"status": "ok"}), 200
 
@@ -353,8 +850,11 @@ if __name__ == "__main__":
     print(f"Paperless URL: {PAPERLESS_URL}")
     print(f"API listening on: {API_HOST}:{API_PORT}")
 
-    # Start auto-scan background worker
-    autoscan_worker()
-
-    # Run Flask app
-    app.run(host=API_HOST, port=API_PORT, debug=False)
+    # Serve Quart app with Hypercorn
+    config = Config()
+    config.bind = [f"{API_HOST}:{API_PORT}"]
+    config.keep_alive_timeout = 75
+    config.accesslog = "-"
+    config.errorlog = "-"
+    config.graceful_timeout = SHUTDOWN_GRACE_TIMEOUT
+    asyncio.run(serve(app, config))